@@ -0,0 +1,28 @@
+import os
+import tempfile
+import time
+import doc_engine
+
+# Timing check for the citation writer: 10k facts must build in linear, low time.
+N_FACTS = 10_000
+BUDGET_SECONDS = 3.0
+
+ppt_data = {"slides": [
+    {"title": f"Slide {s}", "bullets": [
+        {"text": f"Bullet {s}-{b} revenue was 1,200 Cr in FY2023", "fact_ids": [f"F{s * 1000 + b}"]}
+        for b in range(1000)
+    ]}
+    for s in range(N_FACTS // 1000)
+]}
+fact_registry = {
+    f"F{i}": {"text": f"Excerpt {i}", "source": {"document": "Company One-Pager", "section": "Financials"}}
+    for i in range(N_FACTS)
+}
+
+with tempfile.TemporaryDirectory() as tmp:
+    start = time.perf_counter()
+    doc_engine.generate_citation_doc(ppt_data, fact_registry, os.path.join(tmp, "Bench_Citations.docx"))
+    elapsed = time.perf_counter() - start
+
+print(f"{N_FACTS} facts: {elapsed:.2f}s (budget {BUDGET_SECONDS}s)")
+assert elapsed < BUDGET_SECONDS, f"Citation doc too slow: {elapsed:.2f}s"
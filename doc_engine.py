@@ -1,36 +1,131 @@
+import csv
+import json
+import os
+import re
 from docx import Document
+from docx.oxml.ns import qn
+from lxml.etree import SubElement
 
-def generate_citation_doc(ppt_data, fact_registry, filename):
+CITATION_COLUMNS = ["fact_id", "slide", "bullet", "source", "excerpt", "location"]
+CITATION_HEADERS = ["Fact ID", "Slide", "Bullet", "Source", "Excerpt", "Location"]
+
+W_TR, W_TC, W_TCPR, W_GRIDSPAN = qn("w:tr"), qn("w:tc"), qn("w:tcPr"), qn("w:gridSpan")
+W_P, W_R, W_RPR, W_B, W_T, W_VAL = qn("w:p"), qn("w:r"), qn("w:rPr"), qn("w:b"), qn("w:t"), qn("w:val")
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+# Control characters are not allowed in XML; LLM output occasionally has them
+INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _format_source(source):
+    """Returns (source name, location) for the source shapes used across the pipeline."""
+    if isinstance(source, dict):
+        name = source.get("document") or source.get("name") or source.get("source") or "Unknown"
+        location = source.get("section", "")
+        return str(name), str(location)
+    return str(source or "Unknown"), ""
+
+
+def collect_citation_rows(ppt_data, fact_registry):
+    """
+    Flattens slide JSON into one citation row per (bullet, fact_id),
+    grouped by slide in deck order. Single pass over the bullets.
+    """
+    rows = []
+    for slide_no, slide in enumerate(ppt_data.get("slides", []), start=1):
+        slide_title = str(slide.get("title") or f"Slide {slide_no}")
+        for bullet in slide.get("bullets", []):
+            bullet_text = str(bullet.get("text") or "").strip()
+            fact_ids = bullet.get("fact_ids") or []
+            if not isinstance(fact_ids, list):
+                fact_ids = [fact_ids]
+            for fid in fact_ids:
+                fact = fact_registry.get(fid) or {}
+                source_name, location = _format_source(fact.get("source"))
+                source = fact.get("source") if isinstance(fact.get("source"), dict) else {}
+                excerpt = str(source.get("line_excerpt") or fact.get("text") or "").strip()
+                rows.append({
+                    "fact_id": str(fid),
+                    "slide": slide_title,
+                    "bullet": bullet_text,
+                    "source": source_name,
+                    "excerpt": excerpt,
+                    "location": location,
+                })
+    return rows
+
+
+def write_citation_index(rows, filename):
+    """
+    Writes JSON and CSV sidecar indexes next to the citation doc.
+    Returns the paths written.
+    """
+    stem = os.path.splitext(filename)[0]
+    json_path = f"{stem}_index.json"
+    csv_path = f"{stem}_index.csv"
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False)
+
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CITATION_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return json_path, csv_path
+
+
+def _append_row(tbl, values, bold=False, span=None):
+    """
+    Appends a <w:tr> straight onto the table XML. Going through
+    table.add_row() / cell.text costs several proxy objects per cell,
+    which dominates build time on large decks.
+    """
+    tr = SubElement(tbl, W_TR)
+    for value in values:
+        tc = SubElement(tr, W_TC)
+        if span:
+            SubElement(SubElement(tc, W_TCPR), W_GRIDSPAN).set(W_VAL, str(span))
+        r = SubElement(SubElement(tc, W_P), W_R)
+        if bold:
+            SubElement(SubElement(r, W_RPR), W_B)
+        t = SubElement(r, W_T)
+        t.text = INVALID_XML_CHARS.sub("", str(value))
+        t.set(XML_SPACE, "preserve")
+
+
+def generate_citation_doc(ppt_data, fact_registry, filename, write_index=True):
     """
     ppt_data: slide JSON used to generate PPT
     fact_registry: dict { fact_id -> {text, source} }
+
+    Builds a single citation table grouped by slide, plus
+    <filename>_index.json / .csv sidecars for machine lookup.
     """
 
     doc = Document()
     doc.add_heading("Citation Reference Document", level=0)
 
-    used_fact_ids = set()
-
-    # Collect all referenced fact IDs
-    for slide in ppt_data.get("slides", []):
-        for bullet in slide.get("bullets", []):
-            for fid in bullet.get("fact_ids", []):
-                used_fact_ids.add(fid)
+    rows = collect_citation_rows(ppt_data, fact_registry)
 
-    if not used_fact_ids:
+    if not rows:
         doc.add_paragraph("No citations found.")
-        doc.save(filename)
-        return
-
-    # Write citations
-    for fid in sorted(used_fact_ids):
-        fact = fact_registry.get(fid, {})
+    else:
+        table = doc.add_table(rows=0, cols=len(CITATION_HEADERS))
+        table.style = "Table Grid"
+        tbl = table._tbl
+        _append_row(tbl, CITATION_HEADERS, bold=True)
 
-        p = doc.add_paragraph()
-        p.add_run(f"Fact ID: {fid}\n").bold = True
-        p.add_run(f"Source: {fact.get('source', 'Unknown')}\n")
-        p.add_run(f"Excerpt: \"{fact.get('text', '')}\"")
-        doc.add_paragraph("-" * 30)
+        current_slide = None
+        for row in rows:
+            # Slide group header: title spanning the full table width
+            if row["slide"] != current_slide:
+                current_slide = row["slide"]
+                _append_row(tbl, [current_slide], bold=True, span=len(CITATION_COLUMNS))
+            _append_row(tbl, [row[col] for col in CITATION_COLUMNS])
 
     doc.save(filename)
     print(f"Citation Doc Saved: {filename}")
+
+    if write_index:
+        json_path, csv_path = write_citation_index(rows, filename)
+        print(f"Citation Index Saved: {json_path}, {csv_path}")
@@ -0,0 +1,186 @@
+from functools import lru_cache
+
+try:
+    from PIL import ImageFont
+except ImportError:  # measurement falls back to an average glyph width
+    ImageFont = None
+
+# ---------------------------------------------------------
+# CONFIGURATION
+# ---------------------------------------------------------
+REF_SIZE = 100            # glyph widths are measured once at this size and scaled
+FALLBACK_EM_WIDTH = 0.55  # average Arial advance (in em) when no font file is found
+LINE_SPACING = 1.2        # PowerPoint single spacing, in em
+
+# Arial first, then metric-compatible substitutes (Liberation Sans / Arimo)
+FONT_FILES = {
+    "Arial": [
+        "Arial.ttf", "arial.ttf",
+        "/Library/Fonts/Arial.ttf",
+        "/System/Library/Fonts/Supplemental/Arial.ttf",
+        "C:/Windows/Fonts/arial.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Arial.ttf",
+        "LiberationSans-Regular.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+        "/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf",
+        "Arimo-Regular.ttf",
+    ],
+}
+
+# ---------------------------------------------------------
+# GLYPH METRICS (cached per font)
+# ---------------------------------------------------------
+@lru_cache(maxsize=None)
+def _load_font(font_name):
+    if ImageFont is None:
+        return None
+    for candidate in FONT_FILES.get(font_name, []) + [font_name]:
+        try:
+            return ImageFont.truetype(candidate, REF_SIZE)
+        except OSError:
+            continue
+    return None
+
+
+@lru_cache(maxsize=None)
+def _glyph_table(font_name):
+    """{char: advance in em}, pre-filled for printable ASCII and grown lazily."""
+    font = _load_font(font_name)
+    table = {}
+    if font is not None:
+        for code in range(32, 127):
+            table[chr(code)] = font.getlength(chr(code)) / REF_SIZE
+    return table
+
+
+@lru_cache(maxsize=None)
+def line_height_em(font_name):
+    # getmetrics() leaves out the hhea lineGap, so ascent + descent alone
+    # (~1.117 em for Arial) under-counts; never go below PowerPoint's 1.2
+    font = _load_font(font_name)
+    if font is None:
+        return LINE_SPACING
+    ascent, descent = font.getmetrics()
+    return max(LINE_SPACING, (ascent + descent) / REF_SIZE)
+
+
+def _char_em(font_name, ch):
+    table = _glyph_table(font_name)
+    width = table.get(ch)
+    if width is None:
+        font = _load_font(font_name)
+        width = font.getlength(ch) / REF_SIZE if font is not None else FALLBACK_EM_WIDTH
+        table[ch] = width
+    return width
+
+
+def text_width_em(text, font_name="Arial"):
+    """Width of text in em (multiply by the point size to get points)."""
+    return sum(_char_em(font_name, ch) for ch in text)
+
+
+# ---------------------------------------------------------
+# WRAPPING & MEASUREMENT
+# ---------------------------------------------------------
+def wrap_text(text, width_pt, size_pt, font_name="Arial"):
+    """Greedy word wrap, same as PowerPoint's. Returns the list of lines."""
+    max_em = width_pt / size_pt
+    space = _char_em(font_name, " ")
+    lines = []
+    line, line_em = [], 0.0
+
+    for word in text.split():
+        word_em = text_width_em(word, font_name)
+
+        # A single word wider than the box is broken by characters
+        while word_em > max_em:
+            if line:
+                lines.append(" ".join(line))
+                line, line_em = [], 0.0
+            cut, cut_em = 0, 0.0
+            while cut < len(word) and cut_em + _char_em(font_name, word[cut]) <= max_em:
+                cut_em += _char_em(font_name, word[cut])
+                cut += 1
+            cut = max(cut, 1)
+            lines.append(word[:cut])
+            word = word[cut:]
+            word_em = text_width_em(word, font_name)
+
+        if not word:
+            continue
+        needed = word_em if not line else line_em + space + word_em
+        if line and needed > max_em:
+            lines.append(" ".join(line))
+            line, line_em = [word], word_em
+        else:
+            line.append(word)
+            line_em = needed
+
+    if line:
+        lines.append(" ".join(line))
+    return lines or [""]
+
+
+def bullet_height_pt(text, width_pt, size_pt, space_after_pt, font_name="Arial"):
+    lines = len(wrap_text(text, width_pt, size_pt, font_name))
+    return lines * size_pt * line_height_em(font_name) + space_after_pt
+
+
+# ---------------------------------------------------------
+# FITTING: shrink font, then split onto continuation pages
+# ---------------------------------------------------------
+def _fits(texts, width_pt, height_pt, size_pt, space_after_pt, font_name):
+    used = 0.0
+    for text in texts:
+        used += bullet_height_pt(text, width_pt, size_pt, space_after_pt, font_name)
+        if used > height_pt:
+            return False
+    return True
+
+
+def _split_long_bullet(text, width_pt, height_pt, size_pt, space_after_pt, font_name):
+    """Breaks one bullet that cannot fit a whole box into box-sized chunks of lines."""
+    lines = wrap_text(text, width_pt, size_pt, font_name)
+    per_box = max(1, int((height_pt - space_after_pt) // (size_pt * line_height_em(font_name))))
+    return [" ".join(lines[i:i + per_box]) for i in range(0, len(lines), per_box)]
+
+
+def fit_bullets(texts, width_pt, height_pt, sizes_pt=(11, 10), space_after_pt=12, font_name="Arial"):
+    """
+    Lays bullets into a width_pt x height_pt box.
+    Tries each font size in sizes_pt (largest first); if nothing fits, packs
+    bullets at the smallest size into as many pages as needed and then
+    re-fits each page at the largest size it allows.
+
+    Returns [(size_pt, [texts])], one entry per page (first = original slide).
+    """
+    sizes_pt = sorted(sizes_pt, reverse=True)
+    for size in sizes_pt:
+        if _fits(texts, width_pt, height_pt, size, space_after_pt, font_name):
+            return [(size, list(texts))]
+
+    min_size = sizes_pt[-1]
+    pages, page, used = [], [], 0.0
+    for text in texts:
+        h = bullet_height_pt(text, width_pt, min_size, space_after_pt, font_name)
+        if h > height_pt:
+            pieces = _split_long_bullet(text, width_pt, height_pt, min_size, space_after_pt, font_name)
+        else:
+            pieces = [text]
+
+        for piece in pieces:
+            h = bullet_height_pt(piece, width_pt, min_size, space_after_pt, font_name)
+            if page and used + h > height_pt:
+                pages.append(page)
+                page, used = [], 0.0
+            page.append(piece)
+            used += h
+    if page:
+        pages.append(page)
+
+    fitted = []
+    for page in pages:
+        size = next(s for s in sizes_pt
+                    if s == min_size or _fits(page, width_pt, height_pt, s, space_after_pt, font_name))
+        fitted.append((size, page))
+    return fitted
@@ -1,6 +1,8 @@
 
 
 import json
+import os
+import time
 import ollama
 import re
 
@@ -127,3 +129,148 @@ def get_response_from_llm(model,prompt_path, data,temp, retries=2):
                 {response}
                 """
 
+
+
+# ---------------------------------------------------------
+# MODEL CASCADE: cheapest model first, escalate on failed validation
+# ---------------------------------------------------------
+ANALYZER_CASCADE = ["phi3:mini", "mistral:7b"]
+SLIDE_GEN_CASCADE = ["phi3:mini", "mistral:7b"]
+
+# Failures that should escalate to the next model rather than end the job:
+# invalid JSON, model not pulled, Ollama server unreachable
+MODEL_ERRORS = (RuntimeError, ollama.ResponseError, ConnectionError)
+
+# { stage -> { model -> {calls, accepted, rejected, errors, seconds} } }
+ROUTING_STATS = {}
+ROUTING_STATS_DIR = "routing_stats"
+RUN_ID = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def record_route(stage, model, outcome, seconds):
+    stats = ROUTING_STATS.setdefault(stage, {}).setdefault(
+        model, {"calls": 0, "accepted": 0, "rejected": 0, "errors": 0, "seconds": 0.0}
+    )
+    stats["calls"] += 1
+    stats[outcome] += 1
+    stats["seconds"] = round(stats["seconds"] + seconds, 3)
+
+
+def save_routing_stats(stats_dir=ROUTING_STATS_DIR):
+    """
+    Writes this job's routing stats to its own file under stats_dir.
+    One file per job keeps parallel runs from clobbering each other; the
+    temp file + os.replace means readers never see a half-written file.
+    Safe to call repeatedly (the job's file is overwritten).
+    """
+    if not ROUTING_STATS:
+        return None
+    os.makedirs(stats_dir, exist_ok=True)
+    path = os.path.join(stats_dir, f"{RUN_ID}.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(ROUTING_STATS, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_routing_stats(stats_dir=ROUTING_STATS_DIR):
+    """Merges every job's routing stats into {stage -> {model -> totals}} for tuning."""
+    totals = {}
+    if not os.path.isdir(stats_dir):
+        return totals
+    for name in sorted(os.listdir(stats_dir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(stats_dir, name), "r", encoding="utf-8") as f:
+                job_stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for stage, models in job_stats.items():
+            for model, stats in models.items():
+                merged = totals.setdefault(stage, {}).setdefault(model, {})
+                for key, value in stats.items():
+                    merged[key] = round(merged.get(key, 0) + value, 3)
+    return totals
+
+
+def validate_analysis(output, source_text="", min_facts=3):
+    """
+    Schema & coverage checks for analyzer output.
+    Returns a list of problems (empty = accept).
+    """
+    if not isinstance(output, dict):
+        return ["output is not a JSON object"]
+
+    problems = [f"missing key '{k}'" for k in ("company_metadata", "facts", "metrics", "assets")
+                if k not in output]
+
+    facts = output.get("facts")
+    if not isinstance(facts, list):
+        problems.append("'facts' is not a list")
+    elif len(facts) < min_facts:
+        problems.append(f"only {len(facts)} facts (need {min_facts})")
+
+    # Markdown tables in the input are financials; they must show up as metrics
+    has_table = re.search(r"^\s*\|[\s:|-]*-{3,}[\s:|-]*$", source_text, flags=re.MULTILINE)
+    if has_table and not output.get("metrics"):
+        problems.append("input has tables but no metrics were extracted")
+
+    return problems
+
+
+def validate_slides(output, min_slides=3):
+    """Schema checks for slide_gen output."""
+    if not isinstance(output, dict) or not isinstance(output.get("slides"), list):
+        return ["missing 'slides' list"]
+
+    slides = output["slides"]
+    problems = []
+    if len(slides) < min_slides:
+        problems.append(f"only {len(slides)} slides (need {min_slides})")
+
+    for i, slide in enumerate(slides):
+        bullets = slide.get("bullets") if isinstance(slide, dict) else None
+        if not bullets:
+            problems.append(f"slide {i+1} has no bullets")
+            continue
+        if any(not isinstance(b, dict) or not b.get("text") for b in bullets):
+            problems.append(f"slide {i+1} has bullets without text")
+
+    return problems
+
+
+def get_response_with_cascade(models, prompt_path, data, temp, validate, stage, retries=2):
+    """
+    Tries each model in order (cheapest first) and returns the first output
+    that passes validate(output) -> [problems]. If every model fails validation,
+    the last parsed output is returned so the pipeline can still proceed.
+    """
+    last_output = None
+    last_error = None
+
+    for model in models:
+        start = time.perf_counter()
+        try:
+            output = get_response_from_llm(model, prompt_path, data, temp, retries=retries)
+        except MODEL_ERRORS as e:
+            record_route(stage, model, "errors", time.perf_counter() - start)
+            print(f"      [Cascade] {model} failed ({e}), escalating...")
+            last_error = e
+            continue
+
+        problems = validate(output)
+        if not problems:
+            record_route(stage, model, "accepted", time.perf_counter() - start)
+            print(f"      [Cascade] {stage}: accepted output from {model}")
+            return output
+
+        record_route(stage, model, "rejected", time.perf_counter() - start)
+        print(f"      [Cascade] {model} rejected: {'; '.join(problems)}")
+        last_output = output
+
+    if last_output is not None:
+        print(f"      [Cascade] {stage}: no model passed validation, using last output")
+        return last_output
+    raise RuntimeError(f"All models failed for {stage}: {last_error}")
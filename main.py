@@ -1,11 +1,15 @@
+import atexit
 import json
 import os
 import re
+import sys
 import argparse
 from llms import model
 import tools
 import ppt_engine
 import doc_engine
+import verifier
+import profiler
 
 # ---------------------------------------------------------
 # SCRUB COMPANY NAMES
@@ -113,6 +117,17 @@ def enrich_slides(ppt_points, chart_data_dict):
 
     return ppt_points
 
+# ---------------------------------------------------------
+# BUDGET CHECK (abort cleanly instead of taking down the worker)
+# ---------------------------------------------------------
+def check_budget(prof, next_stage):
+    try:
+        return prof.enforce(next_stage)
+    except profiler.BudgetExceeded as e:
+        print(f"ERROR: {e}")
+        prof.save()
+        sys.exit(2)
+
 # ---------------------------------------------------------
 # MAIN EXECUTION
 # ---------------------------------------------------------
@@ -120,24 +135,54 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate PPT and citations from company markdown")
     parser.add_argument("--company", required=True, help="Company name (used for search and output filenames)")
     parser.add_argument("--file", required=True, help="Markdown file name (must be in the same folder as this script)")
+    parser.add_argument("--analyzer-models", default=",".join(model.ANALYZER_CASCADE),
+                        help="Comma-separated analyzer models, cheapest first")
+    parser.add_argument("--slide-models", default=",".join(model.SLIDE_GEN_CASCADE),
+                        help="Comma-separated slide drafting models, cheapest first")
+    parser.add_argument("--min-facts", type=int, default=3,
+                        help="Minimum facts the analyzer must extract before escalating")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record peak RSS, tracemalloc and cProfile per stage to a profile bundle")
+    parser.add_argument("--profile-dir", default="profiles", help="Where profile bundles are written")
+    parser.add_argument("--max-memory-mb", type=float, default=None, help="Per-job peak RSS budget")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Per-job wall time budget")
+    parser.add_argument("--hard-memory-mb", type=float, default=None,
+                        help="RSS cap enforced inside stages; the job aborts (exit 2) if crossed")
+    parser.add_argument("--on-budget", choices=["downgrade", "abort"], default="downgrade",
+                        help="downgrade: cheapest model only, no images, no index; abort: stop the job")
     args = parser.parse_args()
 
     company_name = args.company
     input_file = args.file
 
+    # Routing stats survive failed stages / early exits
+    atexit.register(model.save_routing_stats)
+
+    prof = profiler.StageProfiler(
+        company_name,
+        enabled=args.profile,
+        out_dir=args.profile_dir,
+        max_memory_mb=args.max_memory_mb,
+        max_seconds=args.max_seconds,
+        on_budget=args.on_budget,
+        hard_memory_mb=args.hard_memory_mb
+    )
+
     # ------------------------
     # STEP 1: LOAD RAW DATA
     # ------------------------
-    raw_text = ingest_data(input_file)
+    with prof.stage("ingest"):
+        raw_text = ingest_data(input_file)
     if not raw_text:
         exit()
 
     # STEP 1.1: LOAD PUBLICLY AVAILABLE INFO
     print(f"Searching web for: {company_name} business model manufacturing capacity financials...")
-    public_info = tools.search_web(
-        f"{company_name} business model manufacturing capacity financials",
-        max_results=3
-    )
+    with prof.stage("search"):
+        public_info = tools.search_web(
+            f"{company_name} business model manufacturing capacity financials",
+            max_results=3
+        )
     public_text_blocks = []
     for item in public_info:
         if isinstance(item, dict) and "text" in item:
@@ -156,12 +201,18 @@ if __name__ == "__main__":
     # STEP 2: ANALYZE (LLM)
     # ------------------------
     print("\n[1/4] Analyzing Data (LLM)...")
-    structured_output = model.get_response_from_llm(
-        model="mistral:7b",
-        prompt_path="llms/prompts/analyzer.txt",
-        data=combined_text,
-        temp=0.0
-    )
+    analyzer_models = [m.strip() for m in args.analyzer_models.split(",") if m.strip()]
+    if check_budget(prof, "analyzer"):
+        analyzer_models = analyzer_models[:1]
+    with prof.stage("analyzer"):
+        structured_output = model.get_response_with_cascade(
+            models=analyzer_models,
+            prompt_path="llms/prompts/analyzer.txt",
+            data=combined_text,
+            temp=0.0,
+            validate=lambda out: model.validate_analysis(out, raw_text, min_facts=args.min_facts),
+            stage="analyzer"
+        )
 
     if not structured_output:
         print("ERROR: Analyzer returned empty data.")
@@ -177,65 +228,85 @@ if __name__ == "__main__":
     # First ensure fallback fact_ids & chart metrics
     fact_registry, chart_data_dict = normalize_facts_and_metrics(structured_output, public_text_blocks)
 
-    ppt_points = model.get_response_from_llm(
-        model="phi3:mini",
-        prompt_path="llms/prompts/slide_gen.txt",
-        data=json.dumps(structured_output),
-        temp=0.0
-    )
+    slide_models = [m.strip() for m in args.slide_models.split(",") if m.strip()]
+    if check_budget(prof, "slide_gen"):
+        slide_models = slide_models[:1]
+    with prof.stage("slide_gen"):
+        ppt_points = model.get_response_with_cascade(
+            models=slide_models,
+            prompt_path="llms/prompts/slide_gen.txt",
+            data=json.dumps(structured_output),
+            temp=0.0,
+            validate=model.validate_slides,
+            stage="slide_gen"
+        )
 
 
     # Enrich with images and charts
-    ppt_points = enrich_slides(ppt_points, chart_data_dict)
+    with prof.stage("enrich_slides"):
+        ppt_points = enrich_slides(ppt_points, chart_data_dict)
     # print(f"      Preview: {ppt_points['slides'][0]['bullets'][0]['text'][:50]}...")
     print(ppt_points)  # For debugging
+
+    # ------------------------
+    # STEP 3.1: VERIFY FIGURES (deterministic) & FIX ONLY FAILING BULLETS
+    # ------------------------
+    with prof.stage("verify"):
+        number_index = verifier.build_number_index(combined_text, structured_output)
+        issues = verifier.verify_slides(ppt_points, number_index)
+        if issues:
+            print(f"      Verification flagged {len(issues)} bullet(s); regenerating only those...")
+            fixed = verifier.repair_slides(
+                ppt_points, issues, number_index, fact_registry, structured_output,
+                model_name=slide_models[0]
+            )
+            print(f"      Fixed {fixed}/{len(issues)} flagged bullet(s).")
+
     # ------------------------
     # STEP 4: CREATE POWERPOINT
     # ------------------------
     
     print("\n[3/4] Creating PowerPoint...")
-    ppt_points = scrub_company_names(ppt_points, company_name)
-    ppt_engine.generate_styled_ppt(ppt_points, f"Blind_Teaser_{company_name}_Final.pptx")
+    with prof.stage("scrub_company_names"):
+        ppt_points = scrub_company_names(ppt_points, company_name)
+    if check_budget(prof, "generate_styled_ppt"):
+        # Downgrade: skip image downloads, charts are native and cheap
+        for slide in ppt_points.get("slides", []):
+            slide["image_query"] = None
+    with prof.stage("generate_styled_ppt"):
+        ppt_engine.generate_styled_ppt(ppt_points, f"Blind_Teaser_{company_name}_Final.pptx")
 
     # -----------------------------
     # STEP 5: GENERATE CITATIONS
     # -----------------------------
     print("\n[4/4] Creating Citation Doc...")
 
-    # ---- BUILD FACT REGISTRY FROM SLIDES ----
-    fact_registry = {}
+    # ---- CITATION REGISTRY ----
+    # Analyzer facts (text + source excerpt/section) and PUBLIC_n blocks come
+    # from normalize_facts_and_metrics; slide text is only a fallback for ids
+    # the analyzer never produced (e.g. enrich_slides placeholders)
+    citation_registry = dict(fact_registry)
 
     for slide in ppt_points.get("slides", []):
         for bullet in slide.get("bullets", []):
-            text = bullet.get("text", "").strip()
+            text = str(bullet.get("text") or "").strip()
             if not text:
                 continue
-            # Attach all fact_ids
-            for fid in bullet.get("fact_ids", []):
-                if fid not in fact_registry:
-                    # Assign text and temporary source
-                    fact_registry[fid] = {
+            for fid in bullet.get("fact_ids") or []:
+                if isinstance(fid, str) and fid not in citation_registry:
+                    citation_registry[fid] = {
                         "text": text,
                         "source": {"source": "From the given .md file"}  # default source
                     }
 
-    # ---- MERGE PUBLIC SOURCES ----
-    for item in public_info:
-        if isinstance(item, dict) and "text" in item:
-            source_name = item.get("source", "Public Source")
-            excerpt_text = item["text"].strip()
-            # Attach this public source to all facts that do not yet have a better source
-            for fid, fdata in fact_registry.items():
-                # Only overwrite if source is default
-                if fdata.get("source", {}).get("source") == "LLM Generated":
-                    fdata["source"] = {"source": source_name}
-                    # Optionally, append snippet from public text if fact text is empty
-                    if not fdata["text"]:
-                        fdata["text"] = excerpt_text[:200]  # first 200 chars
-
     # ---- GENERATE DOC ----
-    doc_engine.generate_citation_doc(
-        ppt_data=ppt_points,
-        fact_registry=fact_registry,
-        filename=f"{company_name}_Citations.docx"
-    )
+    write_index = not check_budget(prof, "generate_citation_doc")
+    with prof.stage("generate_citation_doc"):
+        doc_engine.generate_citation_doc(
+            ppt_data=ppt_points,
+            fact_registry=citation_registry,
+            filename=f"{company_name}_Citations.docx",
+            write_index=write_index
+        )
+
+    prof.save()
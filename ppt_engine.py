@@ -3,10 +3,11 @@ import requests
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
-from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
+from pptx.enum.text import PP_ALIGN, MSO_ANCHOR, MSO_AUTO_SIZE
 from pptx.enum.shapes import MSO_CONNECTOR, MSO_SHAPE
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE
+import layout_engine
 
 # ---------------------------------------------------------
 # CONFIGURATION: MODERN GEOMETRIC THEME
@@ -23,9 +24,17 @@ TEXT_COLOR_COVER = RGBColor(255, 255, 255) # White (Cover Text)
 FONT_HEAD = 'Arial'  # Headings (Bold)
 FONT_BODY = 'Arial'  # Body (Regular)
 FONT_SIZE_TITLE = Pt(24)
-FONT_SIZE_BODY = Pt(11) # Spec: 10-12
+FONT_SIZES_BODY = (11, 10)  # Spec: 10-12; layout engine shrinks within this before splitting
+SPACE_AFTER_BODY = 12
 
-# 3. Footer
+# 3. Body text box (left quadrant)
+BODY_LEFT, BODY_TOP = Inches(0.5), Inches(1.4)
+BODY_WIDTH, BODY_HEIGHT = Inches(4.8), Inches(5)
+BODY_MARGIN_X, BODY_MARGIN_Y = Inches(0.1), Inches(0.05)
+BULLET_PREFIX = "■ "
+CONTINUED_SUFFIX = " (cont.)"
+
+# 4. Footer
 FOOTER_TEXT = "Strictly Private & Confidential – Prepared by Kelp M&A Team"
 
 def download_image(query, filename="temp_img.jpg"):
@@ -218,49 +227,69 @@ def generate_styled_ppt(ppt_data, output_file):
     
     slides_list = ppt_data.get("slides", [])
     for i, slide_content in enumerate(slides_list):
-        # 2. CREATE CONTENT SLIDE
-        slide = prs.slides.add_slide(prs.slide_layouts[6]) 
-        
-        apply_slide_branding(slide, slide_content.get("title", "Slide"))
-        
-        # ---------------------------------------------------------
-        # LEFT QUADRANT: Text
-        # ---------------------------------------------------------
-        content_box = slide.shapes.add_textbox(Inches(0.5), Inches(1.4), Inches(4.8), Inches(5))
-        tf = content_box.text_frame
-        tf.word_wrap = True
-        
-        bullets = slide_content.get("bullets", [])
-        for index, bullet in enumerate(bullets):
-            p = tf.add_paragraph()
+        bullet_texts = []
+        for bullet in slide_content.get("bullets", []):
             # Anonymity Filter
             raw_text = bullet.get("text") or bullet.get("textiname") or bullet.get("summary")
-            
             if isinstance(raw_text, str):
-                p.text = "■ " + raw_text 
-            
-            p.font.name = FONT_BODY
-            p.font.size = FONT_SIZE_BODY
-            p.font.color.rgb = TEXT_COLOR_BODY
-            p.space_after = Pt(12) 
+                bullet_texts.append(BULLET_PREFIX + raw_text)
+
+        # Measure in memory; shrink font or spill onto "(cont.)" slides
+        pages = layout_engine.fit_bullets(
+            bullet_texts,
+            width_pt=(BODY_WIDTH - 2 * BODY_MARGIN_X) / Pt(1),
+            height_pt=(BODY_HEIGHT - 2 * BODY_MARGIN_Y) / Pt(1),
+            sizes_pt=FONT_SIZES_BODY,
+            space_after_pt=SPACE_AFTER_BODY,
+            font_name=FONT_BODY
+        )
+
+        for page_no, (font_size, page_texts) in enumerate(pages):
+            # 2. CREATE CONTENT SLIDE
+            slide = prs.slides.add_slide(prs.slide_layouts[6]) 
+
+            title = slide_content.get("title", "Slide")
+            apply_slide_branding(slide, title + (CONTINUED_SUFFIX if page_no else ""))
+
+            # ---------------------------------------------------------
+            # LEFT QUADRANT: Text
+            # ---------------------------------------------------------
+            content_box = slide.shapes.add_textbox(BODY_LEFT, BODY_TOP, BODY_WIDTH, BODY_HEIGHT)
+            tf = content_box.text_frame
+            tf.word_wrap = True
+            tf.auto_size = MSO_AUTO_SIZE.NONE
+            tf.margin_left = tf.margin_right = BODY_MARGIN_X
+            tf.margin_top = tf.margin_bottom = BODY_MARGIN_Y
+
+            for index, text in enumerate(page_texts):
+                p = tf.paragraphs[0] if index == 0 else tf.add_paragraph()
+                p.text = text
+                p.font.name = FONT_BODY
+                p.font.size = Pt(font_size)
+                p.font.color.rgb = TEXT_COLOR_BODY
+                p.space_after = Pt(SPACE_AFTER_BODY)
+
+            # Visuals stay on the first page only
+            if page_no:
+                continue
 
-        # ---------------------------------------------------------
-        # RIGHT QUADRANT: Visuals (Full Bleed-ish)
-        # ---------------------------------------------------------
-        chart_data = slide_content.get("chart_data")
-        has_chart = chart_data and chart_data.get("values") and len(chart_data.get("values")) > 0
+            # ---------------------------------------------------------
+            # RIGHT QUADRANT: Visuals (Full Bleed-ish)
+            # ---------------------------------------------------------
+            chart_data = slide_content.get("chart_data")
+            has_chart = chart_data and chart_data.get("values") and len(chart_data.get("values")) > 0
 
-        if has_chart:
-             create_native_chart(slide, chart_data)
-        elif slide_content.get("image_query"):
-             img_filename = f"temp_img_{i}.jpg"
-             img_path = download_image(slide_content["image_query"], img_filename)
-             if img_path:
-                 try:
-                    # 'Full Bleed' effect on the right edge
-                    slide.shapes.add_picture(img_path, Inches(5.5), Inches(1.5), width=Inches(4.5))
-                 except Exception as e:
-                    print(f"   [Error] Add picture failed: {e}")
+            if has_chart:
+                 create_native_chart(slide, chart_data)
+            elif slide_content.get("image_query"):
+                 img_filename = f"temp_img_{i}.jpg"
+                 img_path = download_image(slide_content["image_query"], img_filename)
+                 if img_path:
+                     try:
+                        # 'Full Bleed' effect on the right edge
+                        slide.shapes.add_picture(img_path, Inches(5.5), Inches(1.5), width=Inches(4.5))
+                     except Exception as e:
+                        print(f"   [Error] Add picture failed: {e}")
 
     # 3. ADD DISCLAIMER SLIDE
     create_disclaimer_slide(prs)
@@ -0,0 +1,265 @@
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+class BudgetExceeded(Exception):
+    """Raised when a job crosses its memory/time budget and the policy is 'abort'."""
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _proc_status_mb(field):
+    try:
+        with open(PROC_STATUS, "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)  # kB
+    except OSError:
+        pass
+    return None
+
+
+def current_rss_mb():
+    """Current RSS in MB; falls back to the lifetime peak where /proc is missing."""
+    rss = _proc_status_mb("VmRSS")
+    return rss if rss is not None else peak_rss_mb()
+
+
+def reset_peak_rss():
+    """
+    Resets the kernel's RSS high-water mark (Linux only) so the next
+    reading of VmHWM covers just the current stage. Returns True on success.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def stage_peak_rss_mb(hwm_reset):
+    if hwm_reset:
+        hwm = _proc_status_mb("VmHWM")
+        if hwm is not None:
+            return hwm
+    return peak_rss_mb()
+
+
+class StageProfiler:
+    """
+    Wraps pipeline stages to record wall time and RSS (start, end, stage peak
+    and delta), and, when enabled, tracemalloc top allocators and cProfile hot
+    functions into a profile bundle.
+
+    Budgets are checked between stages: over_budget() reports what was crossed,
+    enforce() raises BudgetExceeded under the 'abort' policy. A hard memory cap
+    is also enforced inside stages by a watchdog thread, which saves the bundle
+    and ends the job process with exit status 2.
+    """
+
+    def __init__(self, job_name, enabled=False, out_dir="profiles",
+                 max_memory_mb=None, max_seconds=None, on_budget="downgrade",
+                 hard_memory_mb=None, poll_seconds=0.25, top_n=15):
+        self.job_name = job_name
+        self.enabled = enabled
+        self.max_memory_mb = max_memory_mb
+        self.max_seconds = max_seconds
+        self.on_budget = on_budget
+        # Under 'abort' the soft budget is also the in-stage cap
+        self.hard_memory_mb = hard_memory_mb or (max_memory_mb if on_budget == "abort" else None)
+        self.poll_seconds = poll_seconds
+        self.top_n = top_n
+        self.stages = []
+        self.started = time.perf_counter()
+        self.bundle_dir = None
+        self.saved = False
+        self.current_stage = None
+        self.tripped = None
+        # Resetting VmHWM per stage also resets ru_maxrss, so the job-wide
+        # peak has to be carried here
+        self.hwm_reset = False
+        self.job_peak = peak_rss_mb() or 0.0
+
+        if enabled:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            safe_name = re.sub(r"[^\w.-]+", "_", job_name).strip("._") or "job"
+            self.bundle_dir = os.path.join(out_dir, f"{safe_name}_{stamp}")
+            os.makedirs(self.bundle_dir, exist_ok=True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+        # Early exit() / uncaught errors still leave a bundle behind
+        atexit.register(self.save)
+
+        if self.hard_memory_mb:
+            self._start_watchdog()
+
+    # -----------------------------------------------------
+    # IN-STAGE MEMORY WATCHDOG
+    # -----------------------------------------------------
+    def _start_watchdog(self):
+        threading.Thread(target=self._watchdog, daemon=True).start()
+
+    def _watchdog(self):
+        """
+        Polls RSS while a stage runs. On crossing the hard cap it records the
+        abort, saves the bundle and exits the job process with status 2.
+        Exiting from here (rather than raising into the main thread) also
+        works while the main thread is blocked in C code or under cProfile.
+        """
+        while True:
+            time.sleep(self.poll_seconds)
+            stage = self.current_stage
+            rss = current_rss_mb()
+            if stage and rss is not None and rss > self.hard_memory_mb:
+                self.tripped = f"RSS {rss} MB > {self.hard_memory_mb} MB during {stage}"
+                self.job_peak = max(self.job_peak, rss)
+                print(f"ERROR: Budget exceeded: {self.tripped}")
+                self.stages.append({"stage": stage, "aborted": self.tripped,
+                                    "total_seconds": self.elapsed(), "rss_mb": rss})
+                self.save()
+                sys.stdout.flush()
+                os._exit(2)
+
+    # -----------------------------------------------------
+    # STAGES
+    # -----------------------------------------------------
+    @contextmanager
+    def stage(self, name):
+        record = {"stage": name}
+        profile = None
+        before = None
+
+        if self.enabled:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            profile = cProfile.Profile()
+            profile.enable()
+
+        self.job_peak_mb()  # fold in anything since the previous stage
+        hwm_reset = reset_peak_rss()
+        self.hwm_reset = self.hwm_reset or hwm_reset
+        record["rss_start_mb"] = current_rss_mb()
+        self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.current_stage = None
+            record["seconds"] = round(time.perf_counter() - start, 3)
+            record["rss_end_mb"] = current_rss_mb()
+            record["peak_rss_mb"] = stage_peak_rss_mb(hwm_reset)
+            if record["peak_rss_mb"] is not None and record["rss_start_mb"] is not None:
+                record["rss_delta_mb"] = round(record["peak_rss_mb"] - record["rss_start_mb"], 1)
+            if record["peak_rss_mb"] is not None:
+                self.job_peak = max(self.job_peak, record["peak_rss_mb"])
+
+            if self.enabled:
+                profile.disable()
+                record["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                after = tracemalloc.take_snapshot()
+                record["top_allocators"] = [
+                    {"where": str(stat.traceback), "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+                    for stat in after.compare_to(before, "lineno")[:self.top_n]
+                ]
+                record["hot_functions"] = self._write_profile(name, profile)
+
+                print(f"      [Profile] {name}: {record['seconds']}s, peak RSS {record['peak_rss_mb']} MB "
+                      f"(+{record.get('rss_delta_mb')} MB)")
+
+            self.stages.append(record)
+
+    def _write_profile(self, name, profile):
+        profile.dump_stats(os.path.join(self.bundle_dir, f"{name}.prof"))
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).sort_stats("cumulative")
+        stats.print_stats(self.top_n)
+        with open(os.path.join(self.bundle_dir, f"{name}_hot.txt"), "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+
+        hot = []
+        for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+            hot.append({"function": f"{filename}:{line}({func})", "calls": nc,
+                        "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+        hot.sort(key=lambda h: h["cumtime"], reverse=True)
+        return hot[:self.top_n]
+
+    def elapsed(self):
+        return round(time.perf_counter() - self.started, 3)
+
+    def job_peak_mb(self):
+        """Peak RSS over the whole job so far, in MB (None if unavailable)."""
+        now = stage_peak_rss_mb(self.hwm_reset)
+        if now is not None:
+            self.job_peak = max(self.job_peak, now)
+        return self.job_peak or None
+
+    def over_budget(self):
+        """Returns a list of crossed budgets (empty when within budget)."""
+        crossed = []
+        rss = self.job_peak_mb()
+        if self.max_memory_mb and rss is not None and rss > self.max_memory_mb:
+            crossed.append(f"peak RSS {rss} MB > {self.max_memory_mb} MB")
+        if self.max_seconds and self.elapsed() > self.max_seconds:
+            crossed.append(f"elapsed {self.elapsed()}s > {self.max_seconds}s")
+        return crossed
+
+    def enforce(self, next_stage):
+        """
+        Checks budgets before next_stage. Returns True if the job should
+        downgrade, raises BudgetExceeded under the 'abort' policy.
+        """
+        crossed = self.over_budget()
+        if not crossed:
+            return False
+        if self.on_budget == "abort":
+            raise BudgetExceeded(f"Budget exceeded before {next_stage}: {'; '.join(crossed)}")
+        print(f"      [Budget] {'; '.join(crossed)} -> downgrading {next_stage}")
+        return True
+
+    def save(self):
+        """Writes summary.json to the bundle once (no-op when profiling is off)."""
+        if not self.enabled or self.saved:
+            return None
+        self.saved = True
+        summary = {
+            "job": self.job_name,
+            "total_seconds": self.elapsed(),
+            "peak_rss_mb": self.job_peak_mb(),
+            "budgets": {"max_memory_mb": self.max_memory_mb, "max_seconds": self.max_seconds,
+                        "hard_memory_mb": self.hard_memory_mb, "on_budget": self.on_budget},
+            "stages": self.stages,
+        }
+        path = os.path.join(self.bundle_dir, "summary.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Profile Bundle Saved: {self.bundle_dir}")
+        return path
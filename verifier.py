@@ -0,0 +1,235 @@
+import json
+import re
+from llms import model
+
+# Fact/metric IDs (F001, M012) are matched only so they are skipped.
+# Fiscal years (FY24, FY2023, FY2023-24, 2023-24) become year tokens with
+# unit "fy"; a range counts as its ending year, as in the FY24 shorthand.
+NUMBER_PATTERN = re.compile(
+    r"(?<![A-Za-z0-9])(?P<id>[FM]\d+)\b"
+    r"|\bFY\s?'?(?P<fy>\d{4}|\d{2})(?:\s?[-\u2013/]\s?(?P<fy_end>\d{4}|\d{2}))?(?!\d)"
+    r"|(?<![A-Za-z0-9.,])(?P<yr>(?:19|20)\d{2})\s?[-\u2013/]\s?(?P<yr_end>\d{4}|\d{2})(?![\d.,])"
+    r"|(?<![A-Za-z0-9])(?P<num>\d(?:[\d,]*\d)?(?:\.\d+)?)\s*"
+    r"(?P<unit>%|cr\b|crores?\b|lakhs?\b|lacs?\b|mn\b|million\b|bn\b|billion\b|mt\b|mw\b|tonnes?\b|x\b)?",
+    flags=re.IGNORECASE
+)
+
+UNIT_ALIASES = {
+    "crore": "cr", "crores": "cr",
+    "lakh": "lakh", "lakhs": "lakh", "lac": "lakh", "lacs": "lakh",
+    "million": "mn", "billion": "bn",
+    "tonne": "mt", "tonnes": "mt",
+}
+
+# ---------------------------------------------------------
+# NUMBER EXTRACTION
+# ---------------------------------------------------------
+def _fiscal_year(digits, start=None):
+    year = int(digits)
+    if year >= 100:
+        return year
+    if start is None:
+        return year + 2000
+    # Two-digit range end takes the start's century: 2023-24, 1999-00
+    year += start // 100 * 100
+    return year + 100 if year < start else year
+
+
+def extract_numbers(text):
+    """
+    Returns [(value, unit, matched_text)] for every figure in text,
+    with value/unit normalized for comparison.
+    """
+    found = []
+    for m in NUMBER_PATTERN.finditer(str(text or "")):
+        if m.group("id"):
+            continue
+        if m.group("fy"):
+            start = _fiscal_year(m.group("fy"))
+            year = _fiscal_year(m.group("fy_end"), start) if m.group("fy_end") else start
+            found.append((float(year), "fy", m.group(0)))
+            continue
+        if m.group("yr"):
+            start = int(m.group("yr"))
+            end = _fiscal_year(m.group("yr_end"), start)
+            if end == start + 1:
+                found.append((float(end), "fy", m.group(0)))
+            else:
+                # Not a fiscal year (e.g. 2019-2023): keep both years as figures
+                found += [(float(start), "", m.group("yr")), (float(end), "", m.group("yr_end"))]
+            continue
+        try:
+            value = round(float(m.group("num").replace(",", "")), 4)
+        except ValueError:
+            continue
+        unit = (m.group("unit") or "").lower()
+        found.append((value, UNIT_ALIASES.get(unit, unit), m.group(0).strip()))
+    return found
+
+
+def _add_numbers(index, text):
+    for value, unit, _ in extract_numbers(text):
+        index.setdefault(value, set()).add(unit)
+
+
+def _cited_ids(bullet):
+    ids = []
+    for key in ("fact_ids", "metric_ids"):
+        value = bullet.get(key)
+        if isinstance(value, list):
+            ids += [i for i in value if isinstance(i, str)]
+    return ids
+
+
+# ---------------------------------------------------------
+# BUILD INDEX
+# ---------------------------------------------------------
+def build_number_index(source_text, structured_output):
+    """
+    Indexes every figure in the source markdown and analyzer output.
+    Returns {"global": {value: {units}}, "by_id": {fact_or_metric_id: {value: {units}}}}.
+    """
+    global_index = {}
+    by_id = {}
+    _add_numbers(global_index, source_text)
+
+    for f in structured_output.get("facts", []):
+        if not isinstance(f, dict) or not f.get("fact_id"):
+            continue
+        entry = by_id.setdefault(f["fact_id"], {})
+        source = f.get("source") if isinstance(f.get("source"), dict) else {}
+        _add_numbers(entry, f.get("text", ""))
+        _add_numbers(entry, source.get("line_excerpt", ""))
+
+    metrics = structured_output.get("metrics", [])
+    if isinstance(metrics, dict):
+        # {metric_name: {year: value}} shape used for chart data
+        for name, yearly_values in metrics.items():
+            entry = by_id.setdefault(name, {})
+            for year, value in yearly_values.items():
+                _add_numbers(entry, f"{year} {value}")
+    else:
+        for m in metrics:
+            if not isinstance(m, dict) or not m.get("metric_id"):
+                continue
+            entry = by_id.setdefault(m["metric_id"], {})
+            source = m.get("source") if isinstance(m.get("source"), dict) else {}
+            _add_numbers(entry, f"{m.get('value', '')} {m.get('unit', '')}")
+            _add_numbers(entry, m.get("period", ""))
+            _add_numbers(entry, source.get("line_excerpt", ""))
+
+    for entry in by_id.values():
+        for value, units in entry.items():
+            global_index.setdefault(value, set()).update(units)
+
+    return {"global": global_index, "by_id": by_id}
+
+
+# ---------------------------------------------------------
+# VERIFY BULLETS
+# ---------------------------------------------------------
+def _is_supported(value, unit, allowed):
+    units = allowed.get(value)
+    if units is None:
+        return False
+    explicit = units - {""}
+    # Only a unit clash against an explicitly stated unit counts as a mismatch
+    return not unit or not explicit or unit in explicit
+
+
+def verify_bullet(bullet, number_index):
+    """Returns a list of problems with the bullet (empty when it checks out)."""
+    text = bullet.get("text", "")
+    cited = [number_index["by_id"][i]
+             for i in _cited_ids(bullet)
+             if i in number_index["by_id"]]
+
+    if cited:
+        allowed = {}
+        for entry in cited:
+            for value, units in entry.items():
+                allowed.setdefault(value, set()).update(units)
+    else:
+        # Fallback ids (see enrich_slides) point nowhere; check against the whole source
+        allowed = number_index["global"]
+
+    problems = []
+    for value, unit, figure in extract_numbers(text):
+        if not _is_supported(value, unit, allowed):
+            problems.append(f"figure {figure} not found in cited sources")
+
+    return problems
+
+
+def verify_slides(ppt_points, number_index):
+    """Returns [{slide, bullet, text, problems}] for every failing bullet."""
+    issues = []
+    for s_idx, slide in enumerate(ppt_points.get("slides", [])):
+        for b_idx, bullet in enumerate(slide.get("bullets", [])):
+            problems = verify_bullet(bullet, number_index)
+            if problems:
+                issues.append({
+                    "slide": s_idx,
+                    "bullet": b_idx,
+                    "text": bullet.get("text", ""),
+                    "problems": problems,
+                })
+    return issues
+
+
+# ---------------------------------------------------------
+# TARGETED REGENERATION
+# ---------------------------------------------------------
+def _evidence_for(bullet, fact_registry, structured_output):
+    ids = set(_cited_ids(bullet))
+    evidence = [
+        {"fact_id": fid, "text": fact_registry[fid].get("text", "")}
+        for fid in ids if fid in fact_registry
+    ]
+    metrics = structured_output.get("metrics", [])
+    if isinstance(metrics, list):
+        evidence += [m for m in metrics if isinstance(m, dict) and m.get("metric_id") in ids]
+    return evidence
+
+
+def repair_slides(ppt_points, issues, number_index, fact_registry, structured_output,
+                  model_name="phi3:mini"):
+    """
+    Sends only the failing bullets back to the LLM with a small prompt.
+    A rewrite is kept only if it passes verification; otherwise the original stays.
+    """
+    slides = ppt_points.get("slides", [])
+    fixed = 0
+    for issue in issues:
+        bullet = slides[issue["slide"]]["bullets"][issue["bullet"]]
+        payload = {
+            "bullet": bullet.get("text", ""),
+            "problems": issue["problems"],
+            "evidence": _evidence_for(bullet, fact_registry, structured_output),
+        }
+        try:
+            response = model.get_response_from_llm(
+                model=model_name,
+                prompt_path="llms/prompts/bullet_fix.txt",
+                data=json.dumps(payload, indent=2),
+                temp=0.0,
+                # The built-in repair retry asks for the slides schema, never {"text": ...}
+                retries=0
+            )
+        except model.MODEL_ERRORS as e:
+            print(f"   [Verify] Rewrite failed for slide {issue['slide']+1}, bullet {issue['bullet']+1}: {e}")
+            continue
+
+        new_text = response.get("text") if isinstance(response, dict) else None
+        if not isinstance(new_text, str) or not new_text.strip():
+            continue
+
+        candidate = dict(bullet, text=new_text.strip())
+        if verify_bullet(candidate, number_index):
+            print(f"   [Verify] Rewrite still unsupported, keeping original: {bullet.get('text', '')[:60]}")
+            continue
+
+        bullet["text"] = candidate["text"]
+        fixed += 1
+
+    return fixed